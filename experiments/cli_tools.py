@@ -1,49 +1,499 @@
 import numpy as np
 import datetime
 import csv
+import io
+import itertools
+import locale
+import multiprocessing
+import os
+import re
+import warnings
 from maxdiv import maxdiv, preproc
 
-def read_csv_timeseries(input, selected_variables, timecol, timeformat, maxdatapoints):
-    print ("Reading the time series")
-    X = []
-    times = []
-    with open(input, 'r') as csvfile:
-        reader = csv.DictReader(csvfile)
-        if not timecol in reader.fieldnames:
-            raise Exception("No column with name {} found in the file".format(timecol))
-        if selected_variables is None:
-            variables = list(reader.fieldnames)
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
+
+# time formats which can be parsed by NumPy and the resolution of the time specifications
+ISO_TIME_FORMATS = {
+    '%Y-%m-%d'          : 'D',
+    '%Y-%m-%d %H:%M'    : 'm',
+    '%Y-%m-%dT%H:%M'    : 'm',
+    '%Y-%m-%d %H:%M:%S' : 's',
+    '%Y-%m-%dT%H:%M:%S' : 's'
+}
+
+def parse_iso_times(time_strings, timeformat):
+    """ Converts a list of time specifications using NumPy's vectorized parser for ISO 8601 dates.
+    
+    Returns: an array of `datetime64[s]` values or `None` if `timeformat` is not one of the formats
+             in `ISO_TIME_FORMATS` or if not all time specifications match that format exactly.
+    """
+    
+    if (timeformat not in ISO_TIME_FORMATS) or (len(time_strings) == 0):
+        return None
+    try:
+        with warnings.catch_warnings():
+            # time zone designators are deprecated, but will be rejected by the check below anyway
+            warnings.simplefilter('ignore')
+            times = np.array(time_strings, dtype = 'datetime64[s]')
+    except ValueError:
+        return None
+    
+    # NumPy also accepts other variants of ISO 8601, so we check whether formatting
+    # the times again reproduces the original time specifications
+    formatted = np.datetime_as_string(times, unit = ISO_TIME_FORMATS[timeformat])
+    if ' ' in timeformat:
+        formatted = np.char.replace(formatted, 'T', ' ')
+    if np.isnat(times).any() or (formatted != np.array(time_strings)).any() \
+            or (times.min() < np.datetime64('0001-01-01')) or (times.max() >= np.datetime64('10000-01-01')):
+        return None
+    return times
+
+# widths of the numeric directives which can be parsed by parse_fixed_width_times
+FIXED_WIDTH_DIRECTIVES = { 'Y' : 4, 'y' : 2, 'm' : 2, 'd' : 2, 'H' : 2, 'M' : 2, 'S' : 2 }
+
+def parse_fixed_width_times(time_strings, timeformat):
+    """ Converts a list of zero-padded time specifications with vectorized NumPy operations.
+    
+    All time specifications are copied into a single byte matrix, where each directive of `timeformat`
+    occupies a fixed range of columns, so that the digits of all rows can be converted at once instead
+    of matching every row against a regular expression.
+    
+    Returns: an array of `datetime64[s]` values or `None` if `timeformat` contains directives which are not
+             in `FIXED_WIDTH_DIRECTIVES` or if not all time specifications match that format exactly
+             (e.g., because they are not zero-padded or specify an invalid date).
+    """
+    
+    if len(time_strings) == 0:
+        return None
+    
+    # Determine the position of each literal character and each directive
+    literals, fields, width = [], {}, 0
+    for literal, directive in re.findall(r'([^%]*)(?:%(.)|$)', timeformat):
+        if directive == '%':
+            literal += '%'
+        for c in literal:
+            if ord(c) >= 128:
+                return None
+            literals.append((width, ord(c)))
+            width += 1
+        if directive and (directive != '%'):
+            if (directive not in FIXED_WIDTH_DIRECTIVES) or (directive in fields):
+                return None
+            fields[directive] = (width, FIXED_WIDTH_DIRECTIVES[directive])
+            width += FIXED_WIDTH_DIRECTIVES[directive]
+    
+    # One additional column must be empty for every time specification, so that longer ones are rejected
+    try:
+        chars = np.array(time_strings, dtype = 'S{}'.format(width + 1))
+    except UnicodeEncodeError:
+        return None
+    chars = chars.view(np.uint8).reshape(len(time_strings), width + 1)
+    if (chars[:, width] != 0).any() or (chars[:, :width] == 0).any():
+        return None
+    for pos, c in literals:
+        if (chars[:, pos] != c).any():
+            return None
+    
+    values = {}
+    for directive, (pos, num_digits) in fields.items():
+        digits = chars[:, pos:pos+num_digits].astype(np.int64) - ord('0')
+        if ((digits < 0) | (digits > 9)).any():
+            return None
+        values[directive] = digits.dot(10 ** np.arange(num_digits - 1, -1, -1))
+    
+    # Check the ranges of the values like strptime
+    n = len(time_strings)
+    if 'Y' in values:
+        years = values['Y']
+    elif 'y' in values:
+        years = values['y'] + np.where(values['y'] <= 68, 2000, 1900)
+    else:
+        years = np.full(n, 1900, dtype = np.int64)
+    months = values.get('m', np.ones(n, dtype = np.int64))
+    days = values.get('d', np.ones(n, dtype = np.int64))
+    seconds = values.get('H', 0) * 3600 + values.get('M', 0) * 60 + values.get('S', 0)
+    if (years < 1).any() or (months < 1).any() or (months > 12).any() or (days < 1).any() \
+            or np.any(values.get('H', 0) > 23) or np.any(values.get('M', 0) > 59) or np.any(values.get('S', 0) > 59):
+        return None
+    
+    months = ((years - 1970) * 12 + months - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+    if (dates.astype('datetime64[M]') != months).any():
+        return None
+    return dates.astype('datetime64[s]') + np.asarray(seconds).astype('timedelta64[s]')
+
+# regular expressions for the numeric directives of strptime (the same ones as used by strptime itself)
+TIME_DIRECTIVES = {
+    'Y' : r'(?P<Y>\d\d\d\d)',
+    'y' : r'(?P<y>\d\d)',
+    'm' : r'(?P<m>1[0-2]|0[1-9]|[1-9])',
+    'd' : r'(?P<d>3[01]|[12]\d|0[1-9]|[1-9]| [1-9])',
+    'H' : r'(?P<H>2[0-3]|[0-1]\d|\d)',
+    'M' : r'(?P<M>[0-5]\d|\d)',
+    'S' : r'(?P<S>6[0-1]|[0-5]\d|\d)',
+    'f' : r'(?P<f>[0-9]{1,6})',
+    '%' : '%'
+}
+
+# parsers created by compile_time_format for the time formats used so far
+_time_parsers = {}
+
+def compile_time_format(timeformat):
+    """ Creates a parser for time specifications in the given format, which is faster than strptime.
+    
+    strptime converts the format to a regular expression on every call. This is done only once here
+    for each format, but only the numeric directives in `TIME_DIRECTIVES` are supported.
+    
+    Returns: a function which converts a time specification to a `datetime.datetime` object and
+             raises a `ValueError` if it does not match the format, or `None` if the format contains
+             other directives.
+    """
+    
+    if timeformat not in _time_parsers:
+        _time_parsers[timeformat] = _compile_time_format(timeformat)
+    return _time_parsers[timeformat]
+
+def _compile_time_format(timeformat):
+    """ Does the actual work for `compile_time_format` without caching. """
+    
+    pattern = ''
+    for literal, directive in re.findall(r'([^%]*)(?:%(.)|$)', timeformat):
+        # like strptime, we match any sequence of whitespace for whitespace in the format
+        pattern += r'\s+'.join(re.escape(part) for part in re.split(r'\s+', literal))
+        if directive:
+            if directive not in TIME_DIRECTIVES:
+                return None
+            pattern += TIME_DIRECTIVES[directive]
+    try:
+        # unlike $, \Z does not match before a trailing line break, which strptime does not accept either
+        regex = re.compile(r'(?:{})\Z'.format(pattern), re.IGNORECASE)
+    except re.error:
+        return None
+    
+    def parse(time_string):
+        match = regex.match(time_string)
+        if match is None:
+            raise ValueError('time data {!r} does not match format {!r}'.format(time_string, timeformat))
+        fields = match.groupdict()
+        if fields.get('Y') is not None:
+            year = int(fields['Y'])
+        elif fields.get('y') is not None:
+            year = int(fields['y'])
+            year += 2000 if year <= 68 else 1900
         else:
-            variables = selected_variables
-        if timecol in variables:
-            variables.remove(timecol)
-        print ("Variables used: {}".format(variables))
+            year = 1900
+        return datetime.datetime(year, int(fields.get('m') or 1), int(fields.get('d') or 1),
+                                 int(fields.get('H') or 0), int(fields.get('M') or 0), int(fields.get('S') or 0),
+                                 int((fields.get('f') or '0').ljust(6, '0')))
+    
+    return parse
 
-        for row in reader:
-            time_string = row[timecol]
+def make_time_parser(timeformat):
+    """ Creates a function which converts time specifications in the given format to `datetime.datetime` objects.
+    
+    strptime is slow, so a parser compiled by `compile_time_format` is used if possible and the results
+    for time specifications which have already been seen are remembered.
+    """
+    
+    parse_time = compile_time_format(timeformat)
+    if parse_time is None:
+        parse_time = lambda time_string: datetime.datetime.strptime(time_string, timeformat)
+    time_cache = {}
+    
+    def parse(time_string):
+        current_time = time_cache.get(time_string)
+        if current_time is None:
             try:
-                current_time = datetime.datetime.strptime(time_string, timeformat)
+                current_time = parse_time(time_string)
             except:
                 raise Exception("Unable to convert the time specification {} using the format {}".format(time_string, timeformat))
-            times.append(current_time)
-            vector = [ float(row[v]) for v in variables ]
-            X.append(vector)
+            time_cache[time_string] = current_time
+        return current_time
+    
+    return parse
+
+def parse_time_strings(time_strings, timeformat, parse_time):
+    """ Converts a list of time specifications in the format `timeformat` to `datetime64` values.
+    
+    `parse_time` is the function created by `make_time_parser` for `timeformat`. If it is `None`,
+    the time specifications will not be parsed, but returned as an array of strings.
+    
+    `datetime64` values have no time zone, so time specifications with a UTC offset (`%z`) are
+    converted to UTC.
+    
+    Returns: array of `datetime64[us]` values with the converted times.
+    """
+    
+    if parse_time is None:
+        return np.array(time_strings, dtype = str)
+    times = parse_iso_times(time_strings, timeformat)
+    if times is None:
+        times = parse_fixed_width_times(time_strings, timeformat)
+    if times is not None:
+        return times.astype('datetime64[us]')
+    else:
+        times = [parse_time(time_string) for time_string in time_strings]
+        # NumPy would convert aware times to UTC as well, but only with a warning
+        times = [t if t.utcoffset() is None else t.replace(tzinfo = None) - t.utcoffset() for t in times]
+        return np.array(times, dtype = 'datetime64[us]')
 
-            if not maxdatapoints is None and len(X) >= maxdatapoints:
-                break
+def parse_csv_rows(rows, time_index, variable_indices, timeformat, parse_time, dtype = np.float64):
+    """ Converts a list of rows read from a CSV file to time stamps and data points.
+    
+    `parse_time` is the function created by `make_time_parser` for `timeformat`. If it is `None`,
+    the time specifications will not be parsed, but returned as strings.
+    
+    Returns: tuple with an array of the times of the rows and a d-by-n array with their values.
+    """
+    
+    num_columns = max([time_index] + list(variable_indices)) + 1
+    if (len(rows) > 0) and (min(len(row) for row in rows) < num_columns):
+        row = next(row for row in rows if len(row) < num_columns)
+        raise Exception("Found a row with {} instead of at least {} columns: {!r:.100}".format(len(row), num_columns, ','.join(row)))
+    
+    times = parse_time_strings([row[time_index] for row in rows], timeformat, parse_time)
+    
+    # the values of all rows are converted from strings to floats at once by NumPy,
+    # directly in the d-by-n layout, so that no transposed copy is needed
+    values = np.array([[row[i] for row in rows] for i in variable_indices], dtype = dtype).reshape(len(variable_indices), len(rows))
+    return times, values
 
-    X = np.vstack(X).T
-    print ("Data points in the time series: {}".format(X.shape[1]))
-    print ("Dimensions for each data point: {}".format(X.shape[0]))
+def read_csv_block(input, start, end, time_index, variable_indices, timeformat, dtype = np.float64, parse_times = True):
+    """ Reads the rows in the byte range `[start,end)` of a CSV file, which must begin and end at line breaks.
+    
+    Returns: tuple with an array of the times of the rows and a d-by-n array with their values.
+    """
+    
+    with open(input, 'rb') as csvfile:
+        csvfile.seek(start)
+        data = csvfile.read(end - start).decode(locale.getpreferredencoding(False))
+    parse_time = make_time_parser(timeformat) if parse_times else None
+    
+    # the C parser of NumPy is much faster than the csv module, which is only used if it cannot read the block
+    columns = load_csv_columns(io.StringIO(data, newline = '').readlines(), time_index, variable_indices, None, dtype, skiprows = 0)
+    if columns is not None:
+        time_strings, values = columns
+        return parse_time_strings(time_strings, timeformat, parse_time), values
+    
+    # like csv.DictReader, we skip empty lines
+    rows = [row for row in csv.reader(io.StringIO(data, newline = '')) if len(row) > 0]
+    return parse_csv_rows(rows, time_index, variable_indices, timeformat, parse_time, dtype)
+
+def _read_csv_block_args(args):
+    """ Calls `read_csv_block` with the given tuple of arguments (`Pool.starmap` is not available in Python 2). """
+    
+    return read_csv_block(*args)
+
+def load_csv_columns(input, time_index, variable_indices, maxdatapoints = None, dtype = np.float64, skiprows = 1):
+    """ Reads the time column and the selected columns of a CSV file with a header row using `np.loadtxt`.
+    
+    This requires NumPy 1.23 or newer, where `np.loadtxt` is implemented in C. `input` may also be a
+    list of lines, in which case `skiprows` should be set to 0 if they do not start with the header.
+    
+    Returns: tuple with a list of the time specifications as strings and a d-by-n array with the values
+             of the columns with the given indices, or `None` if the file could not be read this way.
+    """
+    
+    if maxdatapoints is not None:
+        maxdatapoints = max(1, maxdatapoints)
+    options = { 'delimiter' : ',', 'quotechar' : '"', 'comments' : None, 'skiprows' : skiprows, 'max_rows' : maxdatapoints,
+                'encoding' : locale.getpreferredencoding(False) }
+    # all columns are read in a single pass using a structured data type with a field for each column
+    columns = sorted(set(variable_indices))
+    row_dtype = np.dtype([('time', object)] + [('c{}'.format(i), dtype) for i in columns])
+    try:
+        with warnings.catch_warnings():
+            # files without data are not a problem
+            warnings.simplefilter('ignore', UserWarning)
+            data = np.loadtxt(input, usecols = [time_index] + columns, ndmin = 1, dtype = row_dtype, **options)
+    except (TypeError, ValueError):
+        # TypeError: quotechar is not supported by old versions of NumPy
+        # ValueError: invalid values or rows with different numbers of columns
+        return None
+    
+    values = np.empty((len(variable_indices), len(data)), dtype = dtype)
+    for i, col in enumerate(variable_indices):
+        values[i] = data['c{}'.format(col)]
+    return data['time'].tolist(), values
+
+def load_csv_arrow(input, timecol, variables, dtype = np.float64):
+    """ Reads the time column and the given columns of a CSV file with a header row using the
+    multi-threaded CSV reader of PyArrow, which needs to be installed for this.
+    
+    Returns: tuple with a list of the time specifications as strings and a d-by-n array with the values
+             of the given columns, or `None` if PyArrow is not available or could not read the file.
+    """
+    
+    if pacsv is None:
+        return None
+    
+    columns = [timecol] + [v for i, v in enumerate(variables) if v not in variables[:i]]
+    try:
+        # values are converted just like by the other readers, i.e., empty fields are not treated as missing
+        table = pacsv.read_csv(input,
+            read_options = pacsv.ReadOptions(encoding = locale.getpreferredencoding(False)),
+            convert_options = pacsv.ConvertOptions(
+                include_columns = columns,
+                column_types = dict([(v, pa.float64()) for v in columns[1:]] + [(timecol, pa.string())]),
+                null_values = [], strings_can_be_null = False
+            ))
+    except ValueError:
+        return None
+    
+    X = np.empty((len(variables), table.num_rows), dtype = dtype)
+    for i, v in enumerate(variables):
+        X[i] = table.column(v).to_numpy()
+    return table.column(timecol).to_pylist(), X
+
+def split_csv_file(input, num_blocks):
+    """ Splits the data rows of a CSV file into blocks of roughly the same size.
+    
+    The boundaries of the blocks are moved to the next line break, so that no row is split.
+    Note that this does not respect line breaks inside of quoted fields.
+    
+    Returns: list with the byte offsets of the boundaries of the blocks, starting after the header.
+    """
+    
+    with open(input, 'rb') as csvfile:
+        csvfile.readline()
+        boundaries = [csvfile.tell()]
+        size = os.fstat(csvfile.fileno()).st_size
+        for k in range(1, num_blocks):
+            pos = boundaries[0] + (size - boundaries[0]) * k // num_blocks
+            if pos > boundaries[-1]:
+                csvfile.seek(pos - 1)
+                csvfile.readline()
+                boundaries.append(csvfile.tell())
+        if size > boundaries[-1]:
+            boundaries.append(size)
+    return boundaries
+
+def read_csv_timeseries(input, selected_variables, timecol, timeformat, maxdatapoints, dtype = np.float64, num_workers = 1, parse_times = True, quiet = False):
+    """ Reads a multivariate time series from a CSV file with a header row.
+    
+    `selected_variables` is a list with the names of the columns to be read (`None` for all columns)
+    and `timecol` is the name of the column with the time specifications in the format `timeformat`.
+    At most `maxdatapoints` rows will be read if it is not `None`.
+    
+    `dtype` is the data type of the returned time series. With `num_workers > 1`, blocks of the file
+    will be parsed in parallel processes, unless `maxdatapoints` is given or PyArrow is installed, which
+    reads the file with multiple threads anyway. Line breaks inside of quoted fields are not supported
+    in that case.
+    
+    If `parse_times` is set to `False`, the time specifications will not be converted, which saves
+    time if they are not needed.
+    
+    If `quiet` is set to `True`, no information about the time series will be printed.
+    
+    Returns: tuple with a d-by-n array with `n` data points, each with `d` attributes, and an array with
+             the times of the data points as `datetime64[us]` values (or strings, see `parse_times`).
+             Times with a UTC offset (`%z` in `timeformat`) are converted to UTC.
+    """
+    
+    if not quiet:
+        print ("Reading the time series")
+    # a large buffer reduces the number of read calls for long time series
+    with io.open(input, 'r', buffering = 1 << 22, newline = '') as csvfile:
+        reader = csv.reader(csvfile)
+        fieldnames = next(reader, [])
+        if not timecol in fieldnames:
+            raise Exception("No column with name {} found in the file".format(timecol))
+        # the list of selected variables given by the caller is not modified
+        variables = [v for v in (fieldnames if selected_variables is None else selected_variables) if v != timecol]
+        if not quiet:
+            print ("Variables used: {}".format(variables))
+        
+        # look up the indices of the columns once instead of creating a dict for each row
+        for v in variables:
+            if not v in fieldnames:
+                raise Exception("No column with name {} found in the file".format(v))
+        time_index = fieldnames.index(timecol)
+        variable_indices = [fieldnames.index(v) for v in variables]
+        
+        if (num_workers > 1) and (maxdatapoints is None) and (pacsv is None):
+            
+            # parse blocks of the file in parallel processes
+            boundaries = split_csv_file(input, num_workers)
+            pool = multiprocessing.Pool(num_workers)
+            try:
+                blocks = pool.map(_read_csv_block_args, [(input, start, end, time_index, variable_indices, timeformat, dtype, parse_times)
+                                                     for start, end in zip(boundaries[:-1], boundaries[1:])])
+            finally:
+                pool.close()
+                pool.join()
+            times = np.concatenate([block_times for block_times, _ in blocks]) if len(blocks) > 0 \
+                    else parse_time_strings([], timeformat, make_time_parser(timeformat) if parse_times else None)
+            X = np.concatenate([values for _, values in blocks], axis = 1) if len(blocks) > 0 else np.empty((len(variables), 0), dtype = dtype)
+            
+        else:
+        
+            # the C parsers of PyArrow and NumPy are much faster than the csv module, which is only used if
+            # PyArrow is not installed, the installed version of NumPy does not provide a C parser, or if the
+            # file cannot be read by them
+            columns = load_csv_arrow(input, timecol, variables, dtype) if maxdatapoints is None else None
+            if columns is None:
+                columns = load_csv_columns(input, time_index, variable_indices, maxdatapoints, dtype)
+            if columns is not None:
+                time_strings, X = columns
+                times = parse_time_strings(time_strings, timeformat, make_time_parser(timeformat) if parse_times else None)
+                
+            else:
+                
+                # the data points are written into the columns of a pre-allocated array, which grows
+                # geometrically if there are more data points than expected
+                capacity = max(1, min(maxdatapoints, 1 << 20)) if maxdatapoints is not None else 4096
+                X = np.empty((len(variables), capacity), dtype = dtype)
+                num_points = 0
+                
+                # the rows are read in chunks, so that the values of all rows in a chunk can be converted at once
+                parse_time = make_time_parser(timeformat) if parse_times else None
+                time_chunks = [parse_time_strings([], timeformat, parse_time)]
+                while (maxdatapoints is None) or (num_points < max(1, maxdatapoints)):
+                    chunk_size = 4096 if maxdatapoints is None else min(4096, max(1, maxdatapoints) - num_points)
+                    rows = list(itertools.islice(reader, chunk_size))
+                    if len(rows) == 0:
+                        break
+                    # like csv.DictReader, we skip empty lines, which are not counted as data points
+                    rows = [row for row in rows if len(row) > 0]
+                    if len(rows) == 0:
+                        continue
+                
+                    chunk_times, chunk_values = parse_csv_rows(rows, time_index, variable_indices, timeformat, parse_time, dtype)
+                    time_chunks.append(chunk_times)
+                
+                    if num_points + len(rows) > capacity:
+                        while num_points + len(rows) > capacity:
+                            capacity *= 2
+                        X_grown = np.empty((X.shape[0], capacity), dtype = dtype)
+                        X_grown[:, :num_points] = X[:, :num_points]
+                        X = X_grown
+                    X[:, num_points:num_points+len(rows)] = chunk_values
+                    num_points += len(rows)
+                
+                # each attribute of the time series is stored contiguously
+                X = np.ascontiguousarray(X[:, :num_points])
+                times = np.concatenate(time_chunks)
+
+    if not quiet:
+        print ("Data points in the time series: {}".format(X.shape[1]))
+        print ("Dimensions for each data point: {}".format(X.shape[0]))
 
     return X, times
 
+# methods offered by the command line parameters, which are determined only once
+_METHODS = maxdiv.get_available_methods()
+_PREPROC_METHODS = preproc.get_available_methods()
+
 def get_algorithm_parameters():
     return ['extint_min_len', 'extint_max_len', 'alpha', 'mode', 'method', 'num_intervals', 'preproc', 'td_dim', 'td_lag', 'proposals',
-            'pca_dim', 'random_projection_dim', 'num_hist', 'num_bins', 'discount'] 
+            'pca_dim', 'random_projection_dim', 'num_hist', 'num_bins', 'discount', 'dtype'] 
 
 def add_algorithm_parameters(parser):
-    parser.add_argument('--method', help='maxdiv method', choices=maxdiv.get_available_methods(), required=True)
+    parser.add_argument('--method', help='maxdiv method', choices=_METHODS, required=True)
     parser.add_argument('--kernel_sigma_sq', help='kernel sigma square hyperparameter for Parzen estimation', type=float, default=1.0)
     parser.add_argument('--num_hist', help='The number of histograms used by the ERPH estimator', type=int, default=100)
     parser.add_argument('--num_bins', help='The number of bins in the histograms used by the ERPH estimator (0 = auto)', type=int, default=0)
@@ -51,9 +501,10 @@ def add_algorithm_parameters(parser):
     parser.add_argument('--extint_min_len', help='minimum length of the extreme interval', default=20, type=int)
     parser.add_argument('--extint_max_len', help='maximum length of the extreme interval', default=100, type=int)
     parser.add_argument('--alpha', help='Hyperparameter for the KL divergence', type=float, default=1.0)
+    parser.add_argument('--dtype', help='floating point precision of the integral sums used by the Python implementation of the parzen, gaussian_global_cov and gaussian_id_cov methods (float32 halves memory consumption, but reduces accuracy; ignored by libmaxdiv)', choices=['float64', 'float32'], default='float64')
     parser.add_argument('--mode', help='Mode for KL divergence computation', choices=['OMEGA_I', 'SYM', 'I_OMEGA', 'TS', 'LAMBDA', 'IS_I_OMEGA', 'JSD', 'CROSSENT', 'CROSSENT_TS'], default='I_OMEGA')
     parser.add_argument('--num_intervals', help='number of intervals to be displayed', default=0, type=int)
-    parser.add_argument('--preproc', help='use a pre-processing method', default=None, choices=preproc.get_available_methods())
+    parser.add_argument('--preproc', help='use a pre-processing method', default=None, choices=_PREPROC_METHODS)
     parser.add_argument('--td_dim', help='Time-Delay Embedding Dimension (may be set to 0 for automatic determination)', default=1, type=int)
     parser.add_argument('--td_lag', help='Time-Lag for Time-Delay Embedding (may be set to 0 for automatic determination)', default=1, type=int)
     parser.add_argument('--pca_dim', help='Reduce data to the given number of dimensions using PCA', default=0, type=int)
@@ -62,4 +513,5 @@ def add_algorithm_parameters(parser):
     parser.add_argument('--prop_th', help='threshold for pointwise interval proposing', type=float, default=1.5)
     parser.add_argument('--prop_mad', help='use MAD to determine the threshold for interval proposing', action='store_true')
     parser.add_argument('--prop_unfiltered', help='use pointwise scores directly for proposals instead of their gradient', action='store_true')
+    parser.add_argument('--prop_top_frac', help='use the given fraction of points with the highest scores for pointwise interval proposing instead of a threshold (not supported by libmaxdiv, so the slower Python implementation will be used)', type=float, default=None)
  
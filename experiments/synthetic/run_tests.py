@@ -36,6 +36,8 @@ parameters['kernelparameters'] = { 'kernel_sigma_sq' : args.kernel_sigma_sq }
 parameters['proposalparameters'] = { 'useMAD' : args.prop_mad, 'sd_th' : args.prop_th }
 if args.prop_unfiltered:
     parameters['proposalparameters']['filter'] = None
+if args.prop_top_frac is not None:
+    parameters['proposalparameters']['top_frac'] = args.prop_top_frac
 
 # Load datasets
 data = datasets.loadDatasets(args.datasets, args.extremetypes)
@@ -184,7 +184,7 @@ def pointwiseScoresToIntervals(scores, min_length = 0):
 
 
 def pointwiseRegionProposals(func, extint_min_len = 20, extint_max_len = 150,
-                             method = 'hotellings_t', filter = [-1, 0, 1], useMAD = False, sd_th = 1.5, **kwargs):
+                             method = 'hotellings_t', filter = [-1, 0, 1], useMAD = False, sd_th = 1.5, top_frac = None, **kwargs):
     """ A generator yielding proposals for possibly anomalous regions.
     
     `func` is the time series to propose possibly anomalous regions for as d-by-n matrix, where
@@ -207,6 +207,9 @@ def pointwiseRegionProposals(func, extint_min_len = 20, extint_max_len = 150,
     `m` is the mean.
     If `useMAD` is set to `True`, the median will be used as a robust estimate of the mean and
     the *Median Absolute Deviation* (MAD) as a robust estimate for the standard deviation.
+    If `top_frac` is given, the threshold will be chosen so that only this fraction of the points
+    with the highest scores is considered instead. Since only pairs of these points are proposed,
+    this bounds the number of proposals independently of the distribution of the scores.
     
     Yields: (a, b, score) tuples, where `a` is the beginning (inclusively) and `b` is the end
             (exclusively) of the proposed region. `score` is a confidence value for the proposal
@@ -216,6 +219,8 @@ def pointwiseRegionProposals(func, extint_min_len = 20, extint_max_len = 150,
     METHODS = { 'hotellings_t' : hotellings_t, 'kde' : pointwiseKDE }
     if method not in METHODS:
         raise NameError('Invalid point-wise scoring method: {}'.format(method))
+    if (top_frac is not None) and not (0 < top_frac <= 1):
+        raise ValueError('top_frac must be in (0, 1]')
     
     # Compute scores
     scores = METHODS[method](func)
@@ -240,23 +245,28 @@ def pointwiseRegionProposals(func, extint_min_len = 20, extint_max_len = 150,
     score_max = scores.max()
     if score_max <= 1e-16:
         return
-    th = score_mean + sd_th * score_sd
-    while not (scores >= th).any():
-        sd_th *= 0.8
+    if top_frac is not None:
+        th = np.percentile(np.ma.compressed(scores), 100 * (1.0 - top_frac))
+    else:
         th = score_mean + sd_th * score_sd
+        while not (scores >= th).any():
+            sd_th *= 0.8
+            th = score_mean + sd_th * score_sd
     
     # Generate inter-peak proposals
     if np.ma.isMaskedArray(scores):
         scores = scores.filled(min(0, scores.min()))
     n = func.shape[1]
     visited = np.zeros(n, dtype = int)
-    for i in range(n - extint_min_len + 1):
-        if scores[i] >= th:
-            for j in range(i + extint_min_len, min(i + extint_max_len, n) + 1):
-                if scores[j-1] >= th:
-                    yield (i, j, (scores[i] + scores[j-1]) / (2 * score_max))
-                    visited[i] += 1
-                    visited[j-1] += 1
+    # only pairs of points above the threshold are proposed, so we look up the possible
+    # end points of the proposals for each start point in the sorted list of these points
+    peaks = np.flatnonzero(scores >= th)
+    for i in peaks[peaks <= n - extint_min_len]:
+        ends = peaks[np.searchsorted(peaks, i + extint_min_len - 1) : np.searchsorted(peaks, min(i + extint_max_len, n) - 1, 'right')]
+        for j in ends:
+            yield (int(i), int(j) + 1, (scores[i] + scores[j]) / (2 * score_max))
+        visited[i] += len(ends)
+        visited[ends] += 1
     
     # Search for isolated peaks and generate proposals with lower threshold
     isolated = np.where((scores >= th) & (visited < 1))[0]
@@ -16,6 +16,7 @@ from ctypes import *
 from ctypes import util
 import numpy as np
 import os.path
+import warnings
 
 
 # Scalar floating point type used by libmaxdiv
@@ -252,6 +253,10 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', *
     params = maxdiv_params_t()
     libmaxdiv.maxdiv_init_params(params)
     
+    # Precision
+    if ('dtype' in kwargs) and (np.dtype(kwargs['dtype']) != np.dtype(np.float32 if maxdiv_scalar == c_float else np.float64)):
+        warnings.warn('libmaxdiv ignores the dtype parameter and uses the precision it has been compiled with.', RuntimeWarning, stacklevel = 3)
+    
     # Length
     params.min_size[:] = [kwargs['extint_min_len'] if 'extint_min_len' in kwargs else 20] * len(params.min_size)
     if 'extint_max_len' in kwargs:
@@ -337,6 +342,8 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', *
             params.pointwise_proposals.mad = pp['useMAD']
         if 'sd_th' in pp:
             params.pointwise_proposals.sd_th = pp['sd_th']
+        if pp.get('top_frac') is not None:
+            raise ValueError('Top-fraction thresholds for pointwise proposals are not supported by libmaxdiv.')
     
     # Pre-processing
     params.preproc.embedding.kt = 1
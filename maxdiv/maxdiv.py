@@ -19,10 +19,16 @@ from scipy.linalg import solve_triangular, cholesky, cho_factor, cho_solve
 from scipy.stats import multivariate_normal
 from sklearn.gaussian_process import GaussianProcess
 from sklearn.gaussian_process.gaussian_process import l1_cross_distances
-import math, time, types, warnings
+import collections, itertools, math, multiprocessing, time, types, warnings
+from multiprocessing.pool import ThreadPool
 from . import maxdiv_util, preproc
 from .baselines_noninterval import pointwiseRegionProposals
 
+try:
+    from numba import njit, prange, literally, get_num_threads
+except ImportError:
+    njit = None
+
 def get_available_methods():
     return ['parzen', 'gaussian_cov', 'gaussian_id_cov', 'gaussian_global_cov', 'gaussian_process', 'erph']
 
@@ -43,7 +49,7 @@ def get_available_methods():
 #
 # Maximally divergent regions using Kernel Density Estimation
 #
-def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, **kwargs):
+def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, dtype = np.float64, gpu = False, num_threads = 1, **kwargs):
     """ Scores given intervals by using Kernel Density Estimation.
     
     `K` is a symmetric kernel matrix whose components are K(|i - j|) for a given kernel K.
@@ -51,13 +57,34 @@ def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, **kwargs):
     `intervals` has to be an iterable of `(a, b, score)` tuples, which define an
     interval `[a,b)` which is suspected to be an anomaly.
     
+    `dtype` specifies the data type of the integral sums of the kernel matrix. Using `np.float32`
+    halves the memory consumption and bandwidth, but reduces the accuracy of the scores.
+    
+    If `gpu` is set to `True`, the 'OMEGA_I', 'I_OMEGA' and 'SYM' modes will be computed on the GPU
+    using CuPy, which must be installed in that case.
+    
+    `num_threads` specifies the number of threads used for scoring the intervals in the 'OMEGA_I',
+    'I_OMEGA' and 'SYM' modes if numba is not available. If it is `None`, one thread per CPU will be used.
+    Each thread holds its own batch of temporary arrays, so the memory consumption grows with `num_threads`.
+    
     Returns: a list of `(a, b, score)` tuples. `a` and `b` are the same as in the given
              `intervals` iterable, but the scores will indicate whether a given interval
              is an anomaly or not.
     """
 
+    # the KL divergences can be computed for many intervals at once using broadcasting,
+    # optionally on the GPU
+    batched = (not np.ma.isMaskedArray(K)) and (mode in ('OMEGA_I', 'I_OMEGA', 'SYM'))
+    if gpu and batched:
+        import cupy as xp
+    else:
+        xp = np
+
     # compute integral sums for each column within the kernel matrix 
-    K_integral = np.cumsum(K if not np.ma.isMaskedArray(K) else K.filled(0), axis = 0)
+    if (xp is np) and (njit is not None):
+        K_integral = _parallel_cumsum_rows(K if not np.ma.isMaskedArray(K) else K.filled(0), dtype)
+    else:
+        K_integral = xp.cumsum(xp.asarray(K) if not np.ma.isMaskedArray(K) else K.filled(0), axis = 0, dtype = dtype)
     # the sum of all kernel values for each column
     # is now given in the last row
     sums_all = K_integral[-1,:]
@@ -72,26 +99,61 @@ def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, **kwargs):
     else:
         numValidSamples = n
 
-    # list of results
-    scores = []
-
     # small constant to avoid problems with log(0)
     eps = 1e-7
+    
+    # the normalizers only depend on the number of points inside and outside of an interval,
+    # so we compute their reciprocals and logarithms once for all possible lengths
+    with np.errstate(divide = 'ignore'):
+        lengths = np.arange(n + 1, dtype = np.float64)
+        inv_lengths = 1.0 / lengths
+        log_lengths = np.log(lengths)
+
+    if batched:
+        kernel = _parzen_kernel if xp is np else None
+        # the look-up tables are copied to the GPU only once
+        inv_lengths_xp, log_lengths_xp = xp.asarray(inv_lengths), xp.asarray(log_lengths)
+        
+        def score_batch(a, b):
+            if kernel is not None:
+                batch_scores = np.empty(len(a))
+                kernel(K_integral, sums_all, a, b, alpha, eps, inv_lengths, log_lengths, batch_scores,
+                       mode in ('OMEGA_I', 'SYM'), mode in ('I_OMEGA', 'SYM'), alpha == 1.0)
+            else:
+                batch_scores = _maxdiv_parzen_batch(K_integral, sums_all, a, b, mode, alpha, eps,
+                                                    inv_lengths_xp, log_lengths_xp, xp)
+                if xp is not np:
+                    batch_scores = xp.asnumpy(batch_scores)
+            return batch_scores
+        
+        # the numba kernel scores all intervals in parallel, so we don't need to split them into batches,
+        # and the GPU is not shared between multiple threads
+        if kernel is not None:
+            return _score_batches(score_batch, intervals, None, 1)
+        else:
+            return _score_batches(score_batch, intervals, max(1, 1048576 // n), num_threads if xp is np else 1)
+
+    # list of results
+    scores = []
 
     # indicators for points inside and outside of the anomalous region
+    valid = np.logical_not(mask) if np.ma.isMaskedArray(K) else np.ones(n, dtype=bool)
     extreme = np.zeros(n, dtype=bool)
-    non_extreme = np.ones(n, dtype=bool)
+    non_extreme = valid.copy()
+    last_a, last_b = 0, 0
     # loop through all intervals
     for a, b, base_score in intervals:
     
         score = 0.0
         
-        extreme[:] = False
-        extreme[a:b] = True
-        non_extreme = np.logical_not(extreme)
-        if np.ma.isMaskedArray(K):
-            extreme[mask] = False
-            non_extreme[mask] = False
+        # update the indicators in-place, only touching the points of the previous and the current interval
+        extreme[last_a:last_b] = False
+        non_extreme[last_a:last_b] = valid[last_a:last_b]
+        extreme[a:b] = valid[a:b]
+        non_extreme[a:b] = False
+        last_a, last_b = a, b
+        # without missing values, the points inside of the interval can be accessed as contiguous slice
+        ext = extreme if np.ma.isMaskedArray(K) else slice(a, b)
 
         # number of data points in the current interval
         extreme_interval_length = b - a if not np.ma.isMaskedArray(K) else b - a - mask[a:b].sum()
@@ -109,7 +171,7 @@ def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, **kwargs):
             sums_extreme /= extreme_interval_length
             sums_non_extreme /= non_extreme_points
             weights = sums_extreme / (sums_non_extreme + eps)
-            weights[extreme] = 1.0
+            weights[ext] = 1.0
             weights /= np.sum(weights)
             kl_integrand1 = np.sum(weights * np.log(sums_non_extreme + eps))
             kl_integrand2 = np.sum(weights * np.log(sums_extreme + eps))
@@ -124,34 +186,30 @@ def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, **kwargs):
             # sums_extreme and sums_non_extreme are vectors of size n
             sums_extreme = K_integral[b-1, non_extreme] - (K_integral[a-1, non_extreme] if a > 0 else 0)
             sums_non_extreme = sums_all[non_extreme] - sums_extreme
-            # divide by the number of data points to get the final
-            # parzen scores for each data point
-            sums_extreme /= extreme_interval_length
-            sums_non_extreme /= non_extreme_points
+            # instead of dividing by the number of data points to get the final
+            # parzen scores for each data point, we use log(s / l + eps) = log(s + eps * l) - log(l)
 
             # version for maximizing KL(p_Omega, p_I)
             # in this case we have p_Omega 
-            kl_integrand1 = np.mean(np.log(sums_extreme + eps))
-            kl_integrand2 = np.mean(np.log(sums_non_extreme + eps))
+            kl_integrand1 = np.mean(np.log(sums_extreme + eps * extreme_interval_length)) - log_lengths[extreme_interval_length]
+            kl_integrand2 = np.mean(np.log(sums_non_extreme + eps * non_extreme_points)) - log_lengths[non_extreme_points]
             negative_kl_Omega_I = alpha * kl_integrand1 - kl_integrand2
             score += - negative_kl_Omega_I
 
         # version for maximizing KL(p_I, p_Omega)
         if mode == "I_OMEGA" or mode == "SYM":
             # for comments see OMEGA_I
-            sums_extreme = K_integral[b-1, extreme] - (K_integral[a-1, extreme] if a > 0 else 0)
-            sums_non_extreme = sums_all[extreme] - sums_extreme
-            sums_extreme /= extreme_interval_length
-            sums_non_extreme /= non_extreme_points
-            kl_integrand1 = np.mean(np.log(sums_non_extreme + eps))
-            kl_integrand2 = np.mean(np.log(sums_extreme + eps))
+            sums_extreme = K_integral[b-1, ext] - (K_integral[a-1, ext] if a > 0 else 0)
+            sums_non_extreme = sums_all[ext] - sums_extreme
+            kl_integrand1 = np.mean(np.log(sums_non_extreme + eps * non_extreme_points)) - log_lengths[non_extreme_points]
+            kl_integrand2 = np.mean(np.log(sums_extreme + eps * extreme_interval_length)) - log_lengths[extreme_interval_length]
             negative_kl_I_Omega = alpha * kl_integrand1 - kl_integrand2
             score += - negative_kl_I_Omega
         
         # Cross Entropy
         if mode == "CROSSENT" or mode == "CROSSENT_TS":
-            sums_extreme = K_integral[b-1, extreme] - (K_integral[a-1, extreme] if a > 0 else 0)
-            sums_non_extreme = sums_all[extreme] - sums_extreme
+            sums_extreme = K_integral[b-1, ext] - (K_integral[a-1, ext] if a > 0 else 0)
+            sums_non_extreme = sums_all[ext] - sums_extreme
             sums_extreme /= extreme_interval_length
             sums_non_extreme /= non_extreme_points
             score -= np.sum(np.log(sums_non_extreme + eps)) if mode == "CROSSENT_TS" else np.mean(np.log(sums_non_extreme + eps))
@@ -161,8 +219,8 @@ def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, **kwargs):
             jsd = 0.0
             
             # Compute p_I and p_Omega for extremal points
-            sums_extreme = K_integral[b-1, extreme] - (K_integral[a-1, extreme] if a > 0 else 0)
-            sums_non_extreme = sums_all[extreme] - sums_extreme
+            sums_extreme = K_integral[b-1, ext] - (K_integral[a-1, ext] if a > 0 else 0)
+            sums_non_extreme = sums_all[ext] - sums_extreme
             sums_extreme /= extreme_interval_length
             sums_non_extreme /= non_extreme_points
             # Compute (p_I + p_Omega)/2 for extremal points
@@ -187,10 +245,277 @@ def maxdiv_parzen(K, intervals, mode = 'I_OMEGA', alpha = 1.0, **kwargs):
     
     return scores
 
+
+def _maxdiv_parzen_batch(K_integral, sums_all, a, b, mode, alpha, eps, inv_lengths, log_lengths, xp = np):
+    """ Vectorized version of the 'OMEGA_I', 'I_OMEGA' and 'SYM' modes of `maxdiv_parzen`.
+    
+    `a` and `b` are arrays with the start and end points of a batch of intervals `[a,b)`.
+    The kernel density estimates for all intervals are computed as one 2-d array with a row
+    for each interval.
+    
+    `inv_lengths` and `log_lengths` are look-up tables with `1/l` and `log(l)` for all `l` from
+    0 to `n`.
+    
+    Returns: array with the scores of the intervals.
+    """
+    
+    n = K_integral.shape[0]
+    # KL(p_I, p_Omega) only needs the points inside of the intervals, so we can restrict
+    # all computations to the range of columns covered by this batch
+    lo, hi = (a.min(), b.max()) if mode == 'I_OMEGA' else (0, n)
+    
+    # number of data points inside and outside of the intervals as column vectors
+    extreme_interval_length = xp.asarray(b - a)[:, None]
+    non_extreme_points = n - extreme_interval_length
+    # the normalizers are taken from the look-up tables, so that we can multiply instead of dividing
+    inv_extreme = inv_lengths[extreme_interval_length[:, 0]]
+    inv_non_extreme = inv_lengths[non_extreme_points[:, 0]]
+    
+    # non-normalized kernel density estimates for all intervals in the batch (one row per interval)
+    sums_extreme = K_integral[xp.asarray(b - 1), lo:hi]
+    # intervals sharing the same start point come in consecutive runs, so we just need to
+    # fetch a single row of the integral for each run instead of one for each interval
+    run_bounds = np.concatenate(([0], np.flatnonzero(a[1:] != a[:-1]) + 1, [len(a)]))
+    for run_start, run_end in zip(run_bounds[:-1], run_bounds[1:]):
+        if a[run_start] > 0:
+            sums_extreme[run_start:run_end] -= K_integral[a[run_start] - 1, lo:hi]
+    sums_non_extreme = sums_all[lo:hi] - sums_extreme
+    # instead of dividing the sums by the number of data points, we use log(s / l + eps) = log(s + eps * l) - log(l)
+    # and subtract the logarithms of the normalizers after averaging
+    sums_extreme += eps * extreme_interval_length
+    sums_non_extreme += eps * non_extreme_points
+    log_norm_extreme = log_lengths[extreme_interval_length[:, 0]]
+    log_norm_non_extreme = log_lengths[non_extreme_points[:, 0]]
+    
+    # the sums over the points inside of the intervals are obtained from cumulative sums along the rows
+    # and the sums over the points outside of the intervals as difference to the total sums, so that we
+    # don't need to create any indicator masks
+    a_rel, b_rel = xp.asarray(a - lo), xp.asarray(b - lo)
+    
+    scores = xp.zeros(len(a))
+    if alpha == 1.0:
+        # log(p_Omega) - log(p_I) can be computed with a single logarithm of the quotient
+        log_quotient = xp.log(sums_non_extreme / sums_extreme)
+        log_norm_quotient = log_norm_non_extreme - log_norm_extreme
+        extreme_sums = _row_range_sums(log_quotient, a_rel, b_rel, xp)
+        if mode == "OMEGA_I" or mode == "SYM":
+            scores += (xp.sum(log_quotient, axis = 1) - extreme_sums) * inv_non_extreme - log_norm_quotient
+        if mode == "I_OMEGA" or mode == "SYM":
+            scores -= extreme_sums * inv_extreme - log_norm_quotient
+        return scores
+    
+    log_sums_extreme = xp.log(sums_extreme)
+    log_sums_non_extreme = xp.log(sums_non_extreme)
+    extreme_sums_extreme = _row_range_sums(log_sums_extreme, a_rel, b_rel, xp)
+    extreme_sums_non_extreme = _row_range_sums(log_sums_non_extreme, a_rel, b_rel, xp)
+    
+    if mode == "OMEGA_I" or mode == "SYM":
+        kl_integrand1 = (xp.sum(log_sums_extreme, axis = 1) - extreme_sums_extreme) * inv_non_extreme - log_norm_extreme
+        kl_integrand2 = (xp.sum(log_sums_non_extreme, axis = 1) - extreme_sums_non_extreme) * inv_non_extreme - log_norm_non_extreme
+        scores -= alpha * kl_integrand1 - kl_integrand2
+    
+    if mode == "I_OMEGA" or mode == "SYM":
+        kl_integrand1 = extreme_sums_non_extreme * inv_extreme - log_norm_non_extreme
+        kl_integrand2 = extreme_sums_extreme * inv_extreme - log_norm_extreme
+        scores -= alpha * kl_integrand1 - kl_integrand2
+    
+    return scores
+
+
+def _row_range_sums(M, starts, ends, xp = np):
+    """ Computes the sums `M[i, starts[i]:ends[i]]` for all rows `i` of the matrix `M`.
+    
+    `xp` is the array module `M`, `starts` and `ends` belong to, i.e., `numpy` or `cupy`.
+    
+    Returns: vector with the sum for each row.
+    """
+    
+    lo, hi = int(starts.min()), int(ends.max())
+    # the cumulative sums are stored in a new contiguous array, the sums for ranges starting at `lo` are just its entries
+    integral = xp.cumsum(M[:, lo:hi], axis = 1)
+    rows = xp.arange(M.shape[0])
+    return integral[rows, ends - lo - 1] - xp.where(starts > lo, integral[rows, xp.maximum(starts - lo - 1, 0)], 0)
+
+
+if njit is not None:
+
+    @njit(parallel = True, fastmath = True, cache = True)
+    def _parzen_kernel(K_integral, sums_all, a, b, alpha, eps, inv_lengths, log_lengths, scores, omega_i, i_omega, alpha_is_one):
+        """ Compiled version of the 'OMEGA_I', 'I_OMEGA' and 'SYM' modes of `maxdiv_parzen`.
+        
+        Scores all intervals `[a[i], b[i])` in parallel and stores the results in `scores`.
+        `inv_lengths` and `log_lengths` are look-up tables with `1/l` and `log(l)` for all `l` from 0 to `n`.
+        The flags `omega_i` and `i_omega` select the KL divergences to be computed (both for 'SYM') and
+        `alpha_is_one` must be `True` if and only if `alpha == 1.0`. They are treated as compile-time
+        constants, so that a specialized version without the branches depending on them is compiled
+        for each combination and cached on disk.
+        """
+        
+        omega_i, i_omega, alpha_is_one = literally(omega_i), literally(i_omega), literally(alpha_is_one)
+        n = K_integral.shape[0]
+        for i in prange(len(a)):
+            extreme_interval_length = b[i] - a[i]
+            non_extreme_points = n - extreme_interval_length
+            # log(s / l + eps) = log(s + eps * l) - log(l), so we don't need to divide the sums
+            eps_extreme = eps * extreme_interval_length
+            eps_non_extreme = eps * non_extreme_points
+            score = 0.0
+            
+            if omega_i:
+                kl_integrand1 = 0.0
+                kl_integrand2 = 0.0
+                # the points outside of the interval are the ranges [0,a) and [b,n)
+                for lo, hi in ((0, a[i]), (b[i], n)):
+                    for k in range(lo, hi):
+                        sums_extreme = K_integral[b[i]-1, k] - (K_integral[a[i]-1, k] if a[i] > 0 else 0.0)
+                        if alpha_is_one:
+                            # log(p_Omega) - log(p_I) can be computed with a single logarithm of the quotient
+                            kl_integrand2 += math.log((sums_all[k] - sums_extreme + eps_non_extreme) / (sums_extreme + eps_extreme))
+                        else:
+                            kl_integrand1 += math.log(sums_extreme + eps_extreme)
+                            kl_integrand2 += math.log(sums_all[k] - sums_extreme + eps_non_extreme)
+                if alpha_is_one:
+                    score += kl_integrand2 * inv_lengths[non_extreme_points] - log_lengths[non_extreme_points] + log_lengths[extreme_interval_length]
+                else:
+                    kl_integrand1 = kl_integrand1 * inv_lengths[non_extreme_points] - log_lengths[extreme_interval_length]
+                    kl_integrand2 = kl_integrand2 * inv_lengths[non_extreme_points] - log_lengths[non_extreme_points]
+                    score += kl_integrand2 - alpha * kl_integrand1
+            
+            if i_omega:
+                kl_integrand1 = 0.0
+                kl_integrand2 = 0.0
+                for k in range(a[i], b[i]):
+                    sums_extreme = K_integral[b[i]-1, k] - (K_integral[a[i]-1, k] if a[i] > 0 else 0.0)
+                    if alpha_is_one:
+                        kl_integrand2 += math.log((sums_extreme + eps_extreme) / (sums_all[k] - sums_extreme + eps_non_extreme))
+                    else:
+                        kl_integrand1 += math.log(sums_all[k] - sums_extreme + eps_non_extreme)
+                        kl_integrand2 += math.log(sums_extreme + eps_extreme)
+                if alpha_is_one:
+                    score += kl_integrand2 * inv_lengths[extreme_interval_length] - log_lengths[extreme_interval_length] + log_lengths[non_extreme_points]
+                else:
+                    kl_integrand1 = kl_integrand1 * inv_lengths[extreme_interval_length] - log_lengths[non_extreme_points]
+                    kl_integrand2 = kl_integrand2 * inv_lengths[extreme_interval_length] - log_lengths[extreme_interval_length]
+                    score += kl_integrand2 - alpha * kl_integrand1
+            
+            scores[i] = score
+
+    
+    @njit(parallel = True, cache = True)
+    def _parallel_cumsum_rows_numba(A, out, num_blocks):
+        """ Computes the cumulative sum of the rows of `A` in parallel and stores it in `out`.
+        
+        The rows are split into `num_blocks` blocks. The sums of the blocks are computed in parallel
+        first, then their prefix sums are used as offsets for computing the cumulative sums within
+        each block in parallel.
+        """
+        
+        n, m = A.shape
+        block_size = (n + num_blocks - 1) // num_blocks
+        offsets = np.zeros((num_blocks + 1, m), dtype = out.dtype)
+        for blk in prange(num_blocks):
+            for i in range(blk * block_size, min((blk + 1) * block_size, n)):
+                for k in range(m):
+                    offsets[blk + 1, k] += A[i, k]
+        for blk in range(1, num_blocks + 1):
+            for k in range(m):
+                offsets[blk, k] += offsets[blk - 1, k]
+        for blk in prange(num_blocks):
+            for i in range(blk * block_size, min((blk + 1) * block_size, n)):
+                for k in range(m):
+                    out[i, k] = (out[i - 1, k] if i > blk * block_size else offsets[blk, k]) + A[i, k]
+    
+    def _parallel_cumsum_rows(A, dtype = np.float64):
+        """ Equivalent to `np.cumsum(A, axis = 0, dtype = dtype)`, but uses multiple threads. """
+        
+        out = np.empty(A.shape, dtype = dtype)
+        _parallel_cumsum_rows_numba(A, out, max(1, min(A.shape[0], get_num_threads())))
+        return out
+
+else:
+    _parzen_kernel = None
+    _parallel_cumsum_rows = None
+
+
+def _integral_batch(integral, a, b):
+    """ Computes the sums over the columns `[a[i], b[i])` of a matrix from its `integral` series along the second axis.
+    
+    Returns: array with the sums for the i-th interval in the i-th row.
+    """
+    
+    return (integral[:, b-1] - np.where(a > 0, integral[:, a-1], 0)).T
+
+
+def _interval_batches(intervals, batch_size):
+    """ Splits an iterable of `(a, b, score)` tuples into batches of at most `batch_size` intervals.
+    
+    If `batch_size` is `None`, all intervals will be put into a single batch.
+    
+    Yields: `(batch, a, b)` tuples, where `batch` is the list of intervals in the batch and `a` and
+            `b` are arrays with their start and end points.
+    """
+    
+    intervals = iter(intervals)
+    while True:
+        batch = list(itertools.islice(intervals, batch_size))
+        if len(batch) == 0:
+            break
+        yield batch, np.array([intvl[0] for intvl in batch]), np.array([intvl[1] for intvl in batch])
+
+
+def _score_batches(score_batch, intervals, batch_size, num_threads = 1):
+    """ Scores an iterable of `(a, b, score)` tuples in batches of at most `batch_size` intervals.
+    
+    `score_batch` is a function which takes two arrays `a` and `b` with the start and end points of a
+    batch of intervals and returns an array with their scores. Since NumPy releases the GIL during
+    most operations, the batches are distributed over `num_threads` threads. If `num_threads` is
+    `None`, one thread per CPU will be used. At most `num_threads` batches are scored at the same time,
+    so that the memory needed for their temporary arrays is bounded.
+    
+    Returns: a list of `(a, b, score)` tuples in the same order as `intervals`.
+    """
+    
+    if num_threads is None:
+        num_threads = multiprocessing.cpu_count()
+    
+    func = lambda batch: (batch[0], score_batch(batch[1], batch[2]))
+    if num_threads > 1:
+        pool = ThreadPool(num_threads)
+        results = _bounded_imap(pool, func, _interval_batches(intervals, batch_size), num_threads)
+    else:
+        pool = None
+        results = (func(batch) for batch in _interval_batches(intervals, batch_size))
+    
+    scores = []
+    try:
+        for batch, batch_scores in results:
+            scores.extend((intvl[0], intvl[1], score) for intvl, score in zip(batch, batch_scores))
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return scores
+
+
+def _bounded_imap(pool, func, iterable, max_pending):
+    """ Like `pool.imap(func, iterable)`, but submits a new task only if less than `max_pending`
+    tasks are running or waiting for their results to be fetched.
+    
+    Yields: the results of `func` in the same order as the items of `iterable`.
+    """
+    
+    pending = collections.deque()
+    for item in iterable:
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (item,)))
+    while len(pending) > 0:
+        yield pending.popleft().get()
+
+
 #
 # Maximally divergent regions using a Gaussian assumption
 #
-def maxdiv_gaussian_globalcov(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'GLOBAL_COV', **kwargs):
+def maxdiv_gaussian_globalcov(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'GLOBAL_COV', dtype = np.float64, **kwargs):
     """ Scores given intervals by assuming gaussian distributions with equal covariance.
     
     `X` is a d-by-n matrix with `n` data points, each with `d` attributes.
@@ -198,6 +523,9 @@ def maxdiv_gaussian_globalcov(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'G
     `intervals` has to be an iterable of `(a, b, score)` tuples, which define an
     interval `[a,b)` which is suspected to be an anomaly.
     
+    `dtype` specifies the data type of the integral sums of the time-series. The covariance matrix
+    will always be computed with double precision.
+    
     Returns: a list of `(a, b, score)` tuples. `a` and `b` are the same as in the given
              `intervals` iterable, but the scores will indicate whether a given interval
              is an anomaly or not.
@@ -206,7 +534,7 @@ def maxdiv_gaussian_globalcov(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'G
     dimension, n = X.shape
     numValidSamples = n if not np.ma.isMaskedArray(X) else X[0,:].count()
 
-    X_integral = np.cumsum(X if not np.ma.isMaskedArray(X) else X.filled(0), axis=1)
+    X_integral = np.cumsum(X if not np.ma.isMaskedArray(X) else X.filled(0), axis=1, dtype=dtype)
     sums_all = X_integral[:, -1]
     if (gaussian_mode == 'GLOBAL_COV') and (dimension > 1):
         cov = np.ma.cov(X).filled(0)
@@ -243,7 +571,7 @@ def maxdiv_gaussian_globalcov(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'G
 #
 # Maximally divergent regions using a Gaussian assumption
 #
-def maxdiv_gaussian(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'COV', **kwargs):
+def maxdiv_gaussian(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'COV', num_threads = 1, **kwargs):
     """ Scores given intervals by assuming gaussian distributions.
     
     `X` is a d-by-n matrix with `n` data points, each with `d` attributes.
@@ -251,6 +579,11 @@ def maxdiv_gaussian(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'COV', **kwa
     `intervals` has to be an iterable of `(a, b, score)` tuples, which define an
     interval `[a,b)` which is suspected to be an anomaly.
     
+    `num_threads` specifies the number of threads used for scoring the intervals with a full
+    covariance matrix. If it is `None`, one thread per CPU will be used. Since NumPy's linear algebra
+    routines may already use multiple threads and each thread holds its own batch of temporary arrays,
+    this is rarely faster than a single thread, but needs more memory.
+    
     Returns: a list of `(a, b, score)` tuples. `a` and `b` are the same as in the given
              `intervals` iterable, but the scores will indicate whether a given interval
              is an anomaly or not.
@@ -261,7 +594,7 @@ def maxdiv_gaussian(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'COV', **kwa
         mode = 'TS'
     
     if gaussian_mode!='COV':
-        return maxdiv_gaussian_globalcov(X, intervals, mode, gaussian_mode)
+        return maxdiv_gaussian_globalcov(X, intervals, mode, gaussian_mode, **kwargs)
 
     dimension, n = X.shape
     numValidSamples = n if not np.ma.isMaskedArray(X) else X[0,:].count()
@@ -271,17 +604,92 @@ def maxdiv_gaussian(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'COV', **kwa
 
     # compute integral series of the outer products
     # we will use this to compute covariance matrices
-    outer_X = np.apply_along_axis(lambda x: np.ravel(np.outer(x,x)), 0, X)
-    if np.ma.isMaskedArray(X):
-        outer_X[:,X.mask[0,:]] = 0
+    X_filled = X if not np.ma.isMaskedArray(X) else X.filled(0)
+    outer_X = np.einsum('in,jn->ijn', X_filled, X_filled).reshape(dimension * dimension, n)
     outer_X_integral = np.cumsum(outer_X, axis=1)
     outer_sums_all = outer_X_integral[:, -1]
     
-    if mode == 'TS':
+    if mode in ('TS', 'CROSSENT_TS'):
         ts_mean = X.shape[0] + (X.shape[0] * (X.shape[0] + 1)) / 2
         ts_sd = np.sqrt(2 * ts_mean)
 
     eps = 1e-7
+    
+    # all divergences except for JSD can be computed for many intervals at once using
+    # the batched versions of the linear algebra routines
+    # the mode parameter determines which KL divergence to use
+    # mode == SYM does not make much sense right now for alpha != 1.0
+    if mode != 'JSD':
+        if np.ma.isMaskedArray(X):
+            valid_integral = np.cumsum(np.logical_not(X.mask[0,:]))
+        
+        def score_batch(a, b):
+            
+            batch_scores = np.zeros(len(a))
+            
+            if np.ma.isMaskedArray(X):
+                extreme_interval_length = valid_integral[b-1] - np.where(a > 0, valid_integral[a-1], 0)
+            else:
+                extreme_interval_length = b - a
+            non_extreme_points = numValidSamples - extreme_interval_length
+            
+            # means and covariance matrices for all intervals in the batch (one row/matrix per interval)
+            sums_extreme = _integral_batch(X_integral, a, b)
+            sums_non_extreme = sums_all - sums_extreme
+            sums_extreme /= extreme_interval_length[:, None]
+            sums_non_extreme /= non_extreme_points[:, None]
+            
+            outer_sums_extreme = _integral_batch(outer_X_integral, a, b)
+            outer_sums_non_extreme = outer_sums_all - outer_sums_extreme
+            outer_sums_extreme /= extreme_interval_length[:, None]
+            outer_sums_non_extreme /= non_extreme_points[:, None]
+            
+            cov_extreme = outer_sums_extreme.reshape(-1, dimension, dimension) - \
+                    sums_extreme[:, :, None] * sums_extreme[:, None, :] + eps * np.eye(dimension)
+            cov_non_extreme = outer_sums_non_extreme.reshape(-1, dimension, dimension) - \
+                    sums_non_extreme[:, :, None] * sums_non_extreme[:, None, :] + eps * np.eye(dimension)
+            
+            try:
+                # Cholesky decompositions C * C^T of the covariance matrices
+                chol_extreme = np.linalg.cholesky(cov_extreme)
+                chol_non_extreme = np.linalg.cholesky(cov_non_extreme)
+                logdet_extreme = 2 * np.log(np.diagonal(chol_extreme, axis1 = 1, axis2 = 2)).sum(axis = 1)
+                logdet_non_extreme = 2 * np.log(np.diagonal(chol_non_extreme, axis1 = 1, axis2 = 2)).sum(axis = 1)
+            except np.linalg.LinAlgError:
+                # rounding errors may render some covariance matrices indefinite
+                chol_extreme = chol_non_extreme = None
+                logdet_extreme = slogdet(cov_extreme)[1]
+                logdet_non_extreme = slogdet(cov_non_extreme)[1]
+            diff = sums_extreme - sums_non_extreme
+            
+            if mode == "OMEGA_I" or mode == "SYM":
+                # terms for the mahalanobis distance and the trace
+                kl_Omega_I = _mahalanobis_trace_batch(cov_extreme, chol_extreme, diff, cov_non_extreme, chol_non_extreme)
+                # logdet terms
+                kl_Omega_I += logdet_extreme - logdet_non_extreme - dimension
+                batch_scores += kl_Omega_I
+            
+            # version for maximizing KL(p_I, p_Omega) or the cross entropy
+            if mode in ("I_OMEGA", "SYM", "TS", "CROSSENT", "CROSSENT_TS"):
+                # terms for the mahalanobis distance and the trace
+                kl_I_Omega = _mahalanobis_trace_batch(cov_non_extreme, chol_non_extreme, diff, cov_extreme, chol_extreme)
+                if mode in ("CROSSENT", "CROSSENT_TS"):
+                    # logdet term of the cross entropy
+                    kl_I_Omega += logdet_non_extreme + dimension * np.log(2 * np.pi)
+                else:
+                    # logdet terms
+                    kl_I_Omega += logdet_non_extreme - logdet_extreme - dimension
+                if mode in ('TS', 'CROSSENT_TS'):
+                    batch_scores += (extreme_interval_length * kl_I_Omega - ts_mean) / ts_sd
+                else:
+                    batch_scores += kl_I_Omega
+            
+            return batch_scores
+        
+        # each interval of a batch needs several d-by-d matrices, so the batches are smaller
+        # for high-dimensional time series to limit the memory consumption
+        return _score_batches(score_batch, intervals, max(1, min(4096, 1048576 // (dimension * dimension))), num_threads)
+    
     for a, b, base_score in intervals:
         
         score = 0.0
@@ -304,69 +712,20 @@ def maxdiv_gaussian(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'COV', **kwa
         cov_non_extreme = np.reshape(outer_sums_non_extreme, [dimension, dimension]) - \
                 np.outer(sums_non_extreme, sums_non_extreme) + eps * np.eye(dimension)
 
-        if mode != 'JSD':
-            logdet_extreme = slogdet(cov_extreme)[1]
-            logdet_non_extreme = slogdet(cov_non_extreme)[1]
-            diff = sums_extreme - sums_non_extreme
-
-        # the mode parameter determines which KL divergence to use
-        # mode == SYM does not make much sense right now for alpha != 1.0
-        if mode == "OMEGA_I" or mode == "SYM":
-            # alternative version using implicit inversion
-            #kl_Omega_I = np.dot(diff, solve(cov_extreme, diff.T) )
-            #kl_Omega_I += np.sum(np.diag(solve(cov_extreme, cov_non_extreme)))
-            inv_cov_extreme = inv(cov_extreme)
-            # term for the mahalanobis distance
-            kl_Omega_I = np.dot(diff, np.dot(inv_cov_extreme, diff.T))
-            # trace term
-            kl_Omega_I += np.trace(np.dot(inv_cov_extreme, cov_non_extreme))
-            # logdet terms
-            kl_Omega_I += logdet_extreme - logdet_non_extreme - dimension
-            score += kl_Omega_I
-
-        # version for maximizing KL(p_I, p_Omega)
-        if mode in ("I_OMEGA", "SYM", "TS"):
-            inv_cov_non_extreme = inv(cov_non_extreme)
-            # term for the mahalanobis distance
-            kl_I_Omega = np.dot(diff, np.dot(inv_cov_non_extreme, diff.T))
-            # trace term
-            kl_I_Omega += np.trace(np.dot(inv_cov_non_extreme, cov_extreme))
-            # logdet terms
-            kl_I_Omega += logdet_non_extreme - logdet_extreme - dimension
-            if mode == 'TS':
-                score += (extreme_interval_length * kl_I_Omega - ts_mean) / ts_sd
-            else:
-                score += kl_I_Omega
-        
-        # version for maximizing Cross Entropy
-        if mode in ("CROSSENT", "CROSSENT_TS"):
-            inv_cov_non_extreme = inv(cov_non_extreme)
-            # term for the mahalanobis distance
-            ce_I_Omega = np.dot(diff, np.dot(inv_cov_non_extreme, diff.T))
-            # trace term
-            ce_I_Omega += np.trace(np.dot(inv_cov_non_extreme, cov_extreme))
-            # logdet term
-            ce_I_Omega += logdet_non_extreme + dimension * np.log(2 * np.pi)
-            if mode == 'CROSSENT_TS':
-                score += (extreme_interval_length * ce_I_Omega - ts_mean) / ts_sd
-            else:
-                score += ce_I_Omega
-        
         # Jensen-Shannon Divergence
-        if mode == 'JSD':
-            # Compute probability densities
-            pdf_extreme     = multivariate_normal.pdf(X.T, sums_extreme, cov_extreme)
-            pdf_non_extreme = multivariate_normal.pdf(X.T, sums_non_extreme, cov_non_extreme)
-            pdf_combined    = (pdf_extreme + pdf_non_extreme) / 2
-            if np.ma.isMaskedArray(X):
-                pdf_extreme = np.ma.MaskedArray(pdf_extreme, X.mask[0,:])
-                pdf_non_extreme = np.ma.MaskedArray(pdf_non_extreme, X.mask[0,:])
-                pdf_combined = np.ma.MaskedArray(pdf_combined, X.mask[0,:])
-            # Compute JSD
-            jsd_extreme     = (np.log2(pdf_extreme[a:b] + eps) - np.log2(pdf_combined[a:b] + eps)).mean()
-            jsd_non_extreme = (np.log2(np.concatenate((pdf_non_extreme[:a], pdf_non_extreme[b:])) + eps)
-                                      - np.log2(np.concatenate((pdf_combined[:a], pdf_combined[b:])) + eps)).mean()
-            score += (jsd_extreme + jsd_non_extreme) / 2.0
+        # Compute probability densities
+        pdf_extreme     = multivariate_normal.pdf(X.T, sums_extreme, cov_extreme)
+        pdf_non_extreme = multivariate_normal.pdf(X.T, sums_non_extreme, cov_non_extreme)
+        pdf_combined    = (pdf_extreme + pdf_non_extreme) / 2
+        if np.ma.isMaskedArray(X):
+            pdf_extreme = np.ma.MaskedArray(pdf_extreme, X.mask[0,:])
+            pdf_non_extreme = np.ma.MaskedArray(pdf_non_extreme, X.mask[0,:])
+            pdf_combined = np.ma.MaskedArray(pdf_combined, X.mask[0,:])
+        # Compute JSD
+        jsd_extreme     = (np.log2(pdf_extreme[a:b] + eps) - np.log2(pdf_combined[a:b] + eps)).mean()
+        jsd_non_extreme = (np.log2(np.concatenate((pdf_non_extreme[:a], pdf_non_extreme[b:])) + eps)
+                                  - np.log2(np.concatenate((pdf_combined[:a], pdf_combined[b:])) + eps)).mean()
+        score += (jsd_extreme + jsd_non_extreme) / 2.0
         
         #print score, cov_extreme, cov_non_extreme, diff
 
@@ -375,6 +734,27 @@ def maxdiv_gaussian(X, intervals, mode = 'I_OMEGA', gaussian_mode = 'COV', **kwa
     return scores
 
 
+def _mahalanobis_trace_batch(cov, chol, diff, cov_other, chol_other):
+    """ Computes `diff^T * cov^-1 * diff + trace(cov^-1 * cov_other)` for a batch of covariance matrices.
+    
+    `cov` and `cov_other` are stacks of covariance matrices and `diff` contains one vector per matrix.
+    
+    If the Cholesky decompositions `chol` and `chol_other` of the covariance matrices are given, the
+    result is obtained as the squared Frobenius norm of `chol^-1 * [diff, chol_other]`, so that no
+    matrix has to be inverted explicitly. They may be set to `None` for matrices which are not positive
+    definite.
+    
+    Returns: array with one value per covariance matrix.
+    """
+    
+    if (chol is not None) and (chol_other is not None):
+        sol = np.linalg.solve(chol, np.concatenate((diff[:, :, None], chol_other), axis = 2))
+        return np.sum(sol * sol, axis = (1, 2))
+    else:
+        sol = np.linalg.solve(cov, np.concatenate((diff[:, :, None], cov_other), axis = 2))
+        return np.einsum('li,li->l', diff, sol[:, :, 0]) + np.trace(sol[:, :, 1:], axis1 = 1, axis2 = 2)
+
+
 #
 # Maximally divergent regions using an Ensemble of Random Projection Histograms
 #
@@ -701,30 +1081,47 @@ def find_max_regions(intervals, num_intervals = None, overlap_th = 0.0):
     if num_intervals == 1:
         return [max(intervals, key = lambda x: x[2])]
     
+    if len(intervals) == 0:
+        return []
+    
+    # Keep start points, end points and scores in separate arrays instead of handling the tuples
+    interval_array = np.array(intervals, dtype = float)
+    starts = interval_array[:,0].astype(int)
+    ends = interval_array[:,1].astype(int)
+    scores = interval_array[:,2]
+    
+    # Intervals with a score of 0 are suppressed by any other detection, so we can remove them
+    # before sorting. Only if there is no interval with a positive score, the first one may
+    # still become the top detection.
+    remaining = np.flatnonzero(scores != 0)
+    if (len(remaining) < len(scores)) and not (scores[remaining] > 0).any():
+        remaining = np.append(remaining, np.argmax(scores == 0))
+    
     # Sort intervals by scores in descending order
-    intervals.sort(key = lambda x: x[2], reverse = True)
+    remaining = remaining[np.argsort(-scores[remaining], kind = 'mergesort')]
+    starts, ends = starts[remaining], ends[remaining]
     
     # Non-maximum suppression
-    n = len(intervals) # total number of intervals
-    include = np.ones(n, dtype = bool) # suppressed intervals will be set to False
-    found_intervals = 0
-    for i in range(n):
-        if include[i]:
-            
-            # Terminate non-maxima suppression if we already have found enough intervals
-            found_intervals += 1
-            if (num_intervals is not None) and (found_intervals >= num_intervals):
-                include[i+1:] = False
-                break
-            
-            # Exclude intervals with a lower score overlapping this one
-            a, b = intervals[i][:2]
-            for j in range(i + 1, n):
-                if include[j] and ((intervals[j][2] == 0) or (maxdiv_util.IoU(a, b - a, intervals[j][0], intervals[j][1] - intervals[j][0]) > overlap_th)):
-                    include[j] = False
+    # The IoU of each detection with all remaining intervals is computed at once and the suppressed
+    # intervals are removed, so that subsequent iterations only need to look at the remaining ones.
+    regions = []
+    while len(remaining) > 0:
+        
+        regions.append(intervals[remaining[0]])
+        
+        # Terminate non-maxima suppression if we already have found enough intervals
+        if (num_intervals is not None) and (len(regions) >= num_intervals):
+            break
+        
+        # Exclude intervals with a lower score overlapping this one
+        a, b = starts[0], ends[0]
+        remaining, starts, ends = remaining[1:], starts[1:], ends[1:]
+        intersection = np.maximum(0, np.minimum(b, ends) - np.maximum(a, starts))
+        iou = intersection / (b - a + ends - starts - intersection).astype(float)
+        keep = np.logical_not(iou > overlap_th)
+        remaining, starts, ends = remaining[keep], starts[keep], ends[keep]
     
-    # Return list of remaining intervals
-    return [intvl for intvl, incl in zip(intervals, include) if incl]
+    return regions
 
 
 #
@@ -740,6 +1137,7 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', u
     
     - `method`: Method for probability density estimation. One of: 'gaussian_cov', 'gaussian_global_cov',
                 'gaussian_id_cov', 'parzen', 'erph'
+                'parzen_gpu' computes 'parzen' on the GPU and requires CuPy (not supported by libmaxdiv).
     
     - `num_intervals`: Number of detections to be returned. If set to `None`, all detections will be returned
                        (after applying non-maximum suppression).
@@ -779,6 +1177,12 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', u
     
     - `kernel_sigma_sq`: Kernel variance for 'parzen' method
     
+    - `dtype`: Data type of the integral sums used by the 'parzen' and 'gaussian_global_cov'/'gaussian_id_cov' methods.
+               Default: `np.float64`. `np.float32` halves memory consumption and bandwidth at the cost of accuracy.
+               libmaxdiv ignores this parameter and uses the precision it has been compiled with.
+    
+    - `num_threads`: Number of threads used by the 'parzen' and 'gaussian_cov' methods (default: 1).
+    
     - `num_hist`: The number of histograms used by the ERPH estimator.
     
     - `num_bins`: The number of bins in the histograms used by the ERPH estimator (0 = auto).
@@ -795,6 +1199,10 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', u
     
     - `prop_unfiltered`: If set to true, pointwise scores will be used directly for proposals instead of their gradient.
     
+    - `prop_top_frac`: Use the given fraction of points with the highest scores for pointwise interval proposals
+                       instead of a threshold (e.g., 0.05).
+                       This is not supported by libmaxdiv, so the Python implementation will be used.
+    
     Returns: List of detections as (a, b, score) tuples, where `a` is the index of the first time-step inside
              of the detected interval and `b` is the first time-step just outside of the interval. The detections
              are sorted by their score in descending order.
@@ -804,11 +1212,11 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', u
         try:
             from . import libmaxdiv_wrapper
             return libmaxdiv_wrapper.maxdiv(X, method, num_intervals, proposals, **kwargs)
-        except:
+        except Exception as e:
             if useLibMaxDiv == True:
                 raise
             else:
-                warnings.warn('libmaxdiv could not be loaded. Falling back to the Python implementation, but this will be much slower and results may be different.', RuntimeWarning, stacklevel = 2)
+                warnings.warn('libmaxdiv could not be used ({}). Falling back to the Python implementation, but this will be much slower and results may be different.'.format(e), RuntimeWarning, stacklevel = 2)
     
     if (not np.ma.isMaskedArray(X)) and np.isnan(X).any():
         X = np.ma.mask_cols(np.ma.masked_invalid(X))
@@ -875,11 +1283,11 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', u
     else:
         kernelparameters = {'kernel_sigma_sq': 1.0}
 
-    if method == 'parzen':
+    if method in ('parzen', 'parzen_gpu'):
         # compute kernel matrix first (Gaussian kernel)
         K = maxdiv_util.calc_gaussian_kernel(X, normalized = False, **kernelparameters)
         # obtain the interval [a,b] of the extreme event with score score
-        interval_scores = maxdiv_parzen(K, intervals, **kwargs)
+        interval_scores = maxdiv_parzen(K, intervals, gpu = (method == 'parzen_gpu'), **kwargs)
     
     elif method == 'gaussian_process':
         interval_scores = maxdiv_gp(X, intervals, **kwargs)
@@ -896,8 +1304,10 @@ def maxdiv(X, method = 'gaussian_cov', num_intervals = 1, proposals = 'dense', u
     else:
         raise Exception("Unknown method {}".format(method))
 
-    if any(math.isnan(score) for a, b, score in interval_scores):
-        raise Exception("NaNs found in interval_scores!")
+    nans = np.isnan(np.fromiter((intvl[2] for intvl in interval_scores), float, len(interval_scores)))
+    if nans.any():
+        a, b = interval_scores[nans.argmax()][:2]
+        raise Exception("NaNs found in interval_scores! (first at interval [{}, {}))".format(a, b))
 
     if 'extint_min_len' in kwargs:
         interval_min_length = kwargs['extint_min_len']
@@ -10,9 +10,23 @@ def enforce_multivariate_timeseries(X):
 
 def calc_distance_matrix(X, metric='sqeuclidean'):
     """ Compute pairwise distances between columns in X """
-    # results from pdist are usually not stored as a symmetric matrix,
-    # therefore, we use squareform to convert it
-    D = scipy.spatial.distance.squareform(scipy.spatial.distance.pdist(X.T, metric))
+    if metric == 'sqeuclidean':
+        # squared euclidean distances can be obtained from the Gram matrix using
+        # ||x - y||^2 = ||x||^2 + ||y||^2 - 2 * <x,y>, which is a single matrix product.
+        # Centering the data first reduces cancellation errors.
+        Xc = X if not np.ma.isMaskedArray(X) else X.filled(0)
+        Xc = Xc - Xc.mean(axis = 1, keepdims = True)
+        D = np.dot(Xc.T, Xc)
+        sq_norms = D.diagonal().copy()
+        D *= -2
+        D += sq_norms[:,None]
+        D += sq_norms[None,:]
+        np.maximum(D, 0, out = D)
+        np.fill_diagonal(D, 0)
+    else:
+        # results from pdist are usually not stored as a symmetric matrix,
+        # therefore, we use squareform to convert it
+        D = scipy.spatial.distance.squareform(scipy.spatial.distance.pdist(X.T, metric))
     if np.ma.isMaskedArray(X):
         D = np.ma.MaskedArray(D)
         D[:,X.mask[0,:]] = D[X.mask[0,:],:] = np.ma.masked
@@ -22,11 +36,14 @@ def calc_distance_matrix(X, metric='sqeuclidean'):
 def calc_gaussian_kernel(X, kernel_sigma_sq = 1.0, normalized=True):
     """ Calculate a normalized Gaussian kernel using the columns of X """
     # Let's first compute the kernel matrix from our squared Euclidean distances in $D$.
-    D = calc_distance_matrix(X)
+    K = calc_distance_matrix(X)
     # compute proper normalized Gaussian kernel values
-    K = np.exp(-D/(2.0*kernel_sigma_sq))
+    # (in-place, so that we don't need to allocate further n-by-n matrices)
+    K_data = np.ma.getdata(K)
+    K_data *= -1.0 / (2.0*kernel_sigma_sq)
+    np.exp(K_data, out = K_data)
     if normalized:
-        K = K / ((2*np.pi*kernel_sigma_sq) ** (X.shape[0] / 2))
+        K_data /= ((2*np.pi*kernel_sigma_sq) ** (X.shape[0] / 2))
     return K
 
 